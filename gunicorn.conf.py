@@ -0,0 +1,17 @@
+import os
+
+# Gunicorn configuration for serving the web interface in production.
+# Run `gunicorn` from the project root; this file is picked up automatically.
+
+chdir = "src"
+wsgi_app = "app:app"
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5001")
+
+# Report generation runs in background processes, so request handlers only do
+# short I/O work; threaded workers let each process serve many of them at once.
+# Each worker runs its own pool of REPORT_WORKERS report processes, each with its
+# own OpenAI rate limiter, so up to workers x REPORT_WORKERS reports run at once
+# and share the OpenAI rate limits. Keep the worker count small.
+workers = int(os.environ.get("GUNICORN_WORKERS", 2))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 8))
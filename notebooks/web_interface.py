@@ -36,11 +36,15 @@ def health_check():
 
 import tempfile
 import os
+import shutil
 from flask import Flask, request, jsonify
 
 UPLOAD_FOLDER = "./uploads"
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Block size used when streaming uploaded files to disk
+UPLOAD_BUFFER_SIZE = 1024 * 1024
+
 @app.route("/upload", methods=["POST"])
 def upload_file():
     """
@@ -55,7 +59,8 @@ def upload_file():
 
     # Save the file with a unique temporary name
     temp_file = tempfile.NamedTemporaryFile(dir=UPLOAD_FOLDER, delete=False, suffix=".csv")
-    file.save(temp_file.name)
+    with temp_file:
+        shutil.copyfileobj(file.stream, temp_file, length=UPLOAD_BUFFER_SIZE)
 
     return jsonify({"uploaded_file": temp_file.name}), 200
 
@@ -91,10 +96,11 @@ def process_file():
 
     # Save the file with a unique temporary name
     temp_input_file = tempfile.NamedTemporaryFile(dir=UPLOAD_FOLDER, delete=False, suffix=".csv")
-    file.save(temp_input_file.name)
+    with temp_input_file:
+        shutil.copyfileobj(file.stream, temp_input_file, length=UPLOAD_BUFFER_SIZE)
 
     # Create unique file paths for intermediate and output files
-    temp_analysis_file = tempfile.NamedTemporaryFile(dir=OUTPUT_FOLDER, delete=False, suffix=".json").name
+    temp_analysis_file = tempfile.NamedTemporaryFile(dir=OUTPUT_FOLDER, delete=False, suffix=".jsonl").name
     temp_generalized_file = tempfile.NamedTemporaryFile(dir=OUTPUT_FOLDER, delete=False, suffix=".json").name
 
     try:
@@ -137,6 +143,7 @@ def process_file():
 from flask import Flask, request, jsonify
 import os
 import tempfile
+import orjson
 from src.report_generator import generate_report_data
 
 @app.route("/generate-report-json", methods=["POST"])
@@ -151,25 +158,23 @@ def generate_report_json():
     if file.filename == "":
         return jsonify({"error": "No file selected"}), 400
 
-    # Save the uploaded file to a temporary location
-    temp_input_file = tempfile.NamedTemporaryFile(dir="data/processed", delete=False, suffix=".json")
-    file.save(temp_input_file.name)
+    # Parse the uploaded file directly from the request stream
+    try:
+        data = orjson.loads(file.stream.read())
+    except ValueError as e:
+        return jsonify({"error": f"Invalid analysis JSON: {e}"}), 400
 
     # Create a temporary output file
     temp_output_file = tempfile.NamedTemporaryFile(dir="data/processed", delete=False, suffix=".json").name
 
     try:
         # Generate the report data JSON
-        report_data = generate_report_data(temp_input_file.name, temp_output_file)
+        report_data = generate_report_data(data, temp_output_file)
     except Exception as e:
-        os.remove(temp_input_file.name)
         if os.path.exists(temp_output_file):
             os.remove(temp_output_file)
         return jsonify({"error": f"Report generation failed: {e}"}), 500
 
-    # Clean up input file
-    os.remove(temp_input_file.name)
-
     # Return the path to the output JSON file
     return jsonify({"report_data_file": temp_output_file}), 200
 
@@ -197,7 +202,7 @@ from flask import Flask, request, jsonify, send_file
 import os
 import tempfile
 from src.visualization import generate_pdf_report
-import json
+import orjson
 
 @app.route("/generate-pdf-report", methods=["POST"])
 def generate_pdf_report_endpoint():
@@ -211,30 +216,24 @@ def generate_pdf_report_endpoint():
     if file.filename == "":
         return jsonify({"error": "No file selected"}), 400
 
-    # Save the uploaded JSON file to a temporary location
-    temp_input_file = tempfile.NamedTemporaryFile(dir="data/processed", delete=False, suffix=".json")
-    file.save(temp_input_file.name)
+    # Parse the uploaded JSON file directly from the request stream
+    try:
+        report_data = orjson.loads(file.stream.read())
+    except ValueError as e:
+        return jsonify({"error": f"Invalid report data JSON: {e}"}), 400
 
     # Generate a temporary output directory for the PDF report
     temp_output_dir = tempfile.TemporaryDirectory(dir="data/processed")
     pdf_report_path = os.path.join(temp_output_dir.name, "final_report.pdf")
 
     try:
-        # Load the report data
-        with open(temp_input_file.name, "r") as json_file:
-            report_data = json.load(json_file)
-
         # Generate the PDF report
         generate_pdf_report(report_data, output_dir=temp_output_dir.name, report_name="final_report.pdf")
     except Exception as e:
-        # Cleanup temporary files and directories
-        os.remove(temp_input_file.name)
+        # Cleanup the temporary directory
         temp_output_dir.cleanup()
         return jsonify({"error": f"PDF generation failed: {e}"}), 500
 
-    # Cleanup input file
-    os.remove(temp_input_file.name)
-
     # Serve the generated PDF file
     #return jsonify({"pdf_report_path": pdf_report_path}), 200
     return send_file(pdf_report_path, as_attachment=True, download_name="final_report.pdf")
@@ -245,4 +244,4 @@ def generate_pdf_report_endpoint():
 
 
 if __name__ == "__main__":
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    app.run(port=5000)
\ No newline at end of file
@@ -1,6 +1,13 @@
+import io
 import os
+import shutil
 import tempfile
-import json
+import threading
+import time
+import uuid
+import orjson
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from flask import Flask, request, jsonify, send_file, render_template
 from text_analysis import batch_process_texts, process_and_save_generalized_topics
 from report_generator import generate_report_data
@@ -8,6 +15,163 @@ from visualization import generate_pdf_report
 
 app = Flask(__name__)
 
+# Block size used when streaming uploaded files to disk
+UPLOAD_BUFFER_SIZE = 1024 * 1024
+
+# Report jobs run in background worker processes. Each job owns a directory
+# named after its id; the job status is derived from the files inside it, so
+# any server process can answer status and download requests.
+JOBS_FOLDER = os.environ.get("REPORT_JOBS_DIR", os.path.join(tempfile.gettempdir(), "hotel_review_jobs"))
+JOB_INPUT_FILE = "input.csv"
+JOB_REPORT_FILE = "final_report.pdf"
+JOB_ERROR_FILE = "error.txt"
+# Jobs that failed or were never downloaded are removed after this many seconds
+JOB_EXPIRY_SECONDS = int(os.environ.get("REPORT_JOB_EXPIRY_SECONDS", 24 * 60 * 60))
+REPORT_WORKERS = int(os.environ.get("REPORT_WORKERS", 2))
+executor = ProcessPoolExecutor(max_workers=REPORT_WORKERS)
+executor_lock = threading.Lock()
+
+
+def run_pipeline(job_dir):
+    """
+    Run the full analysis pipeline for the CSV file uploaded to a job directory.
+
+    The generated PDF report is moved into the job directory once complete; on
+    failure, an error message is written there instead.
+
+    Args:
+        job_dir (str): Path to the job directory containing the uploaded CSV file.
+
+    Returns:
+        None
+    """
+    try:
+        # All intermediate files live in a single temporary directory, removed on exit
+        with tempfile.TemporaryDirectory(dir=job_dir) as work_dir:
+            input_csv = os.path.join(work_dir, "input.csv")
+            analysis_jsonl = os.path.join(work_dir, "analysis.jsonl")
+            generalized_json = os.path.join(work_dir, "generalized.json")
+            pdf_report = os.path.join(work_dir, "report.pdf")
+
+            # Move the uploaded CSV file into the working directory
+            os.replace(os.path.join(job_dir, JOB_INPUT_FILE), input_csv)
+
+            # Step 1: Perform text analysis
+            batch_process_texts(input_csv, analysis_jsonl, limit=10, chunk_size=100)
+            process_and_save_generalized_topics(analysis_jsonl, generalized_json)
+
+            # Step 2: Generate report data; the file is parsed here rather than through
+            # the report generator's cache, since each job's file is read only once
+            with open(generalized_json, "rb") as json_file:
+                report_data = generate_report_data(orjson.loads(json_file.read()))
+
+            # Step 3: Generate PDF report
+            generate_pdf_report(report_data, output_dir=work_dir, report_name=os.path.basename(pdf_report))
+
+            # Publish the report atomically, marking the job as completed
+            os.replace(pdf_report, os.path.join(job_dir, JOB_REPORT_FILE))
+
+    except Exception as e:
+        with open(os.path.join(job_dir, JOB_ERROR_FILE), "w") as error_file:
+            error_file.write(f"Failed to generate report: {e}")
+
+
+def record_job_failure(job_dir, pool, future):
+    """
+    Mark a job as failed when its worker process did not finish it.
+
+    run_pipeline handles its own errors, so an exception on the future means
+    the job never ran to completion, e.g. because the worker process was killed.
+
+    Args:
+        job_dir (str): Path to the job directory of the submitted job.
+        pool (ProcessPoolExecutor): The process pool the job was submitted to.
+        future (concurrent.futures.Future): The future of the submitted job.
+
+    Returns:
+        None
+    """
+    error = "cancelled" if future.cancelled() else future.exception()
+    if error is None:
+        return
+    if isinstance(error, BrokenProcessPool):
+        reset_executor(pool)
+    try:
+        with open(os.path.join(job_dir, JOB_ERROR_FILE), "w") as error_file:
+            error_file.write(f"Failed to generate report: {error}")
+    except OSError:
+        # The job directory has already been removed
+        pass
+
+
+def reset_executor(broken_pool):
+    """
+    Replace the process pool once it is broken, so new jobs can still be run.
+
+    Args:
+        broken_pool (ProcessPoolExecutor): The pool found to be broken. It is
+            only replaced if no other request has replaced it already.
+
+    Returns:
+        None
+    """
+    global executor
+    with executor_lock:
+        if broken_pool is executor:
+            executor.shutdown(wait=False)
+            executor = ProcessPoolExecutor(max_workers=REPORT_WORKERS)
+
+
+def submit_job(job_dir):
+    """
+    Run the pipeline for a job in the background, recreating a broken process pool.
+
+    Args:
+        job_dir (str): Path to the job directory containing the uploaded CSV file.
+
+    Returns:
+        None
+    """
+    pool = executor
+    try:
+        future = pool.submit(run_pipeline, job_dir)
+    except BrokenProcessPool:
+        reset_executor(pool)
+        pool = executor
+        future = pool.submit(run_pipeline, job_dir)
+    future.add_done_callback(lambda done: record_job_failure(job_dir, pool, done))
+
+
+def remove_expired_jobs():
+    """
+    Remove job directories that have not been modified for JOB_EXPIRY_SECONDS.
+    """
+    cutoff = time.time() - JOB_EXPIRY_SECONDS
+    try:
+        entries = list(os.scandir(JOBS_FOLDER))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        try:
+            if entry.is_dir() and entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+        except FileNotFoundError:
+            # Removed concurrently by another request
+            continue
+
+
+def get_job_dir(job_id):
+    """
+    Return the directory of an existing job, or None if the job id is unknown.
+    """
+    try:
+        job_id = uuid.UUID(job_id).hex
+    except ValueError:
+        return None
+    job_dir = os.path.join(JOBS_FOLDER, job_id)
+    return job_dir if os.path.isdir(job_dir) else None
+
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -15,7 +179,7 @@ def index():
 @app.route("/generate-report", methods=["POST"])
 def generate_report():
     """
-    Endpoint to generate a PDF report from an uploaded CSV file.
+    Endpoint to submit a PDF report job for an uploaded CSV file.
     """
     if "file" not in request.files:
         return jsonify({"error": "No file part in the request"}), 400
@@ -24,55 +188,70 @@ def generate_report():
     if file.filename == "":
         return jsonify({"error": "No file selected"}), 400
 
-    # Define directories for processing
-    upload_folder = tempfile.TemporaryDirectory()
-    output_folder = tempfile.TemporaryDirectory()
+    remove_expired_jobs()
 
-    # Temporary file paths
-    temp_input_csv = tempfile.NamedTemporaryFile(dir=upload_folder.name, delete=False, suffix=".csv").name
-    temp_analysis_json = tempfile.NamedTemporaryFile(dir=output_folder.name, delete=False, suffix=".json").name
-    temp_generalized_json = tempfile.NamedTemporaryFile(dir=output_folder.name, delete=False, suffix=".json").name
-    temp_report_json = tempfile.NamedTemporaryFile(dir=output_folder.name, delete=False, suffix=".json").name
-    temp_pdf_report = tempfile.NamedTemporaryFile(dir=output_folder.name, delete=False, suffix=".pdf").name
+    job_id = uuid.uuid4().hex
+    job_dir = os.path.join(JOBS_FOLDER, job_id)
+    os.makedirs(job_dir)
 
     try:
-        # Save the uploaded CSV file
-        file.save(temp_input_csv)
+        # Save the uploaded CSV file, streaming it to disk in large blocks
+        with open(os.path.join(job_dir, JOB_INPUT_FILE), "wb") as csv_file:
+            shutil.copyfileobj(file.stream, csv_file, length=UPLOAD_BUFFER_SIZE)
+
+        # Run the pipeline in the background
+        submit_job(job_dir)
 
-        # Step 1: Perform text analysis
-        batch_process_texts(temp_input_csv, temp_analysis_json, limit=10, chunk_size=100)
-        process_and_save_generalized_topics(temp_analysis_json, temp_generalized_json)
+    except Exception as e:
+        shutil.rmtree(job_dir, ignore_errors=True)
+        return jsonify({"error": f"Failed to submit report job: {e}"}), 500
 
-        # Step 2: Generate report data JSON
-        generate_report_data(temp_generalized_json, temp_report_json)
+    return jsonify({"job_id": job_id}), 202
 
-        # Step 3: Generate PDF report
-        with open(temp_report_json, "r") as json_file:
-            report_data = json.load(json_file)
-        generate_pdf_report(report_data, output_dir=os.path.dirname(temp_pdf_report), report_name=os.path.basename(temp_pdf_report))
+@app.route("/status/<job_id>", methods=["GET"])
+def job_status(job_id):
+    """
+    Endpoint to check the status of a report job.
+    """
+    job_dir = get_job_dir(job_id)
+    if job_dir is None:
+        return jsonify({"error": "Unknown job"}), 404
 
-        # Return the PDF file
-        return send_file(temp_pdf_report, as_attachment=True, download_name="final_report.pdf")
+    if os.path.exists(os.path.join(job_dir, JOB_REPORT_FILE)):
+        return jsonify({"job_id": job_id, "status": "completed"}), 200
 
-    except Exception as e:
-        # Handle any exceptions and clean up
-        return jsonify({"error": f"Failed to generate report: {e}"}), 500
-    finally:
-        # Clean up all temporary files and directories
-        if os.path.exists(temp_input_csv):
-            os.remove(temp_input_csv)
-        if os.path.exists(temp_analysis_json):
-            os.remove(temp_analysis_json)
-        if os.path.exists(temp_generalized_json):
-            os.remove(temp_generalized_json)
-        if os.path.exists(temp_report_json):
-            os.remove(temp_report_json)
-        if os.path.exists(temp_pdf_report):
-            os.remove(temp_pdf_report)
-        upload_folder.cleanup()
-        output_folder.cleanup()
+    error_path = os.path.join(job_dir, JOB_ERROR_FILE)
+    if os.path.exists(error_path):
+        with open(error_path, "r") as error_file:
+            error = error_file.read()
+        return jsonify({"job_id": job_id, "status": "failed", "error": error}), 200
+
+    return jsonify({"job_id": job_id, "status": "pending"}), 200
+
+@app.route("/download/<job_id>", methods=["GET"])
+def download_report(job_id):
+    """
+    Endpoint to download the PDF report of a completed job and clean up the job.
+    """
+    job_dir = get_job_dir(job_id)
+    if job_dir is None:
+        return jsonify({"error": "Unknown job"}), 404
+
+    report_path = os.path.join(job_dir, JOB_REPORT_FILE)
+    if not os.path.exists(report_path):
+        return jsonify({"error": "Report is not ready yet"}), 409
+
+    # Load the report into memory so the job directory can be removed right away
+    with open(report_path, "rb") as pdf_file:
+        report = io.BytesIO(pdf_file.read())
+    shutil.rmtree(job_dir, ignore_errors=True)
+
+    # Return the PDF file
+    return send_file(report, mimetype="application/pdf", as_attachment=True, download_name="final_report.pdf")
 
 if __name__ == "__main__":
-    app.run(debug=True, port=5001)
+    app.run(port=5001)
 
-# curl -X POST -F "file=@data/processed/sample2.csv" http://127.0.0.1:5000/generate-report --output outputs/report.pdf
\ No newline at end of file
+# curl -X POST -F "file=@data/processed/sample2.csv" http://127.0.0.1:5001/generate-report
+# curl http://127.0.0.1:5001/status/<job_id>
+# curl http://127.0.0.1:5001/download/<job_id> --output outputs/report.pdf
@@ -1,21 +1,21 @@
-import pandas as pd
-import ast
+import pyarrow as pa
+import pyarrow.compute as pc
+from pyarrow import csv as pacsv
 
+# Matches the 'overall' value in the dict-like string of the 'ratings' column
+OVERALL_RATING_PATTERN = r"'overall'\s*:\s*(?P<overall>\d+(?:\.\d+)?)"
 
-def extract_overall_rating(rating_str):
-    """
-    Extract the 'overall' rating from the JSON-like string in the 'ratings' column.
-    """
-    try:
-        # Convert string to dictionary
-        rating_dict = ast.literal_eval(rating_str)
-        # Extract the 'overall' value
-        return rating_dict.get('overall', None)
-    except (ValueError, SyntaxError):
-        return None  # Handle parsing errors gracefully
+# Explicit types for the filtered columns, so that type inference on the first
+# block cannot conflict with values found in later blocks
+COLUMN_TYPES = {
+    'ratings': pa.string(),
+    'text': pa.string(),
+    'date_stayed': pa.string(),
+    'num_helpful_votes': pa.int64(),
+}
 
 
-def transform_csv(input_file, output_file, chunk_size=100000, helpful_votes_threshold=5):
+def transform_csv(input_file, output_file, block_size=64 << 20, helpful_votes_threshold=5):
     """
     Transforms a large CSV file by applying filtering criteria and saving 
     the result.
@@ -23,45 +23,65 @@ def transform_csv(input_file, output_file, chunk_size=100000, helpful_votes_thre
     Args:
         input_file (str): Path to the input CSV file.
         output_file (str): Path to save the transformed CSV file.
-        chunk_size (int): Number of rows to process in each chunk.
+        block_size (int): Number of bytes of the input file to process in 
+        each block.
         helpful_votes_threshold (int): Minimum number of helpful votes 
         for inclusion.
 
     Returns:
         None
     """
-    write_header = True  # Write header only for the first chunk
-
-    # Process the CSV file in chunks
-    for chunk in pd.read_csv(input_file, chunksize=chunk_size):
-        # Extract the 'overall' rating
-        chunk['overall'] = chunk['ratings'].apply(
-            lambda x: extract_overall_rating(x) if isinstance(x, str) else None)
-
-        # Filter rows based on 'overall' rating
-        filtered_chunk = chunk[(chunk['overall'] == 2) | (chunk['overall'] == 3)]
-
-        # Filter rows with non-empty 'text'
-        filtered_chunk = filtered_chunk.dropna(subset=['text'])
-        filtered_chunk = filtered_chunk[filtered_chunk['text'].str.strip() != ""]
-
-        # Filter rows with valid 'date_stayed'
-        filtered_chunk = filtered_chunk.dropna(subset=['date_stayed'])
-
-        # Convert 'date_stayed' to datetime format (Month Year)
-        filtered_chunk['date_stayed'] = pd.to_datetime(
-            filtered_chunk['date_stayed'], format='%B %Y', errors='coerce'
+    write_header = True  # Write header only for the first block
+
+    # Keep the output file open for all blocks instead of reopening it per block
+    with open(output_file, 'w', encoding='utf-8', newline='') as output_file_handle:
+        # Stream the CSV file in blocks using Arrow's multithreaded parser
+        reader = pacsv.open_csv(
+            input_file,
+            read_options=pacsv.ReadOptions(block_size=block_size),
+            parse_options=pacsv.ParseOptions(newlines_in_values=True),
+            convert_options=pacsv.ConvertOptions(column_types=COLUMN_TYPES)
         )
-        filtered_chunk = filtered_chunk.dropna(subset=['date_stayed'])
-
-        # Filter rows with 'num_helpful_votes' greater than the threshold
-        filtered_chunk = filtered_chunk[filtered_chunk['num_helpful_votes'] >= helpful_votes_threshold]
-
-        # Append the filtered chunk to the output CSV
-        filtered_chunk.to_csv(output_file, mode='a', header=write_header, index=False)
-
-        # After the first chunk, set header to False
-        write_header = False
+        for batch in reader:
+            chunk = pa.Table.from_batches([batch])
+
+            # Extract the 'overall' rating (missing or malformed values become null)
+            overall = pc.cast(
+                pc.struct_field(pc.extract_regex(chunk['ratings'], OVERALL_RATING_PATTERN), 'overall'),
+                pa.float32()
+            )
+            overall_index = chunk.schema.get_field_index('overall')
+            if overall_index == -1:
+                chunk = chunk.append_column('overall', overall)
+            else:
+                chunk = chunk.set_column(overall_index, 'overall', overall)
+
+            # Convert 'date_stayed' to datetime format (Month Year), invalid dates become null
+            date_stayed = pc.strptime(chunk['date_stayed'], format='%B %Y', unit='s', error_is_null=True)
+            chunk = chunk.set_column(chunk.schema.get_field_index('date_stayed'), 'date_stayed', date_stayed)
+
+            # Combine all filtering criteria into a single mask (null values are dropped):
+            # 'overall' rating of 2 or 3, non-empty 'text', valid 'date_stayed' and
+            # 'num_helpful_votes' greater than the threshold
+            mask = pc.and_(
+                pc.and_(
+                    pc.is_in(overall, value_set=pa.array([2, 3], pa.float32())),
+                    pc.greater(pc.utf8_length(pc.utf8_trim_whitespace(chunk['text'])), 0)
+                ),
+                pc.and_(
+                    pc.is_valid(date_stayed),
+                    pc.greater_equal(chunk['num_helpful_votes'], helpful_votes_threshold)
+                )
+            )
+
+            # Apply the mask once and convert only the remaining rows to pandas
+            filtered_chunk = chunk.filter(mask).to_pandas()
+
+            # Append the filtered chunk to the output CSV
+            filtered_chunk.to_csv(output_file_handle, header=write_header, index=False)
+
+            # After the first block, set header to False
+            write_header = False
 
     print(f"Filtered data saved to {output_file}")
 
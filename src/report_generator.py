@@ -1,6 +1,14 @@
 import os
-import json
+import time
+import hashlib
+import argparse
+import orjson
+import numpy as np
 from collections import Counter
+from itertools import chain
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from diskcache import Cache
 from openai import OpenAI
 
 # Initialize OpenAI client
@@ -8,20 +16,163 @@ client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
 openai_model = "gpt-4o-mini"
 openai_temperature = 0.7
 
+# Seconds to wait between status checks of an OpenAI batch job
+openai_batch_poll_interval = 30
 
-def load_analysis_data(input_file):
-    with open(input_file, "r") as json_file:
-        data = json.load(json_file)
+# Disk-backed cache for OpenAI responses, shared across processes and runs
+openai_cache = Cache(os.environ.get("OPENAI_CACHE_DIR", ".cache/openai"))
+
+
+def hash_cache_key(cache_key):
+    """
+    Return the disk cache key for a request, including the model settings.
+    """
+    return hashlib.sha256(
+        f"{cache_key}\0{openai_model}\0{openai_temperature}".encode("utf-8")
+    ).hexdigest()
+
+
+def build_chat_completion_request(system_prompt, prompt):
+    """
+    Build the chat completion request body shared by the real-time and Batch APIs.
+
+    JSON mode guarantees the response content is a valid JSON object, so it can be
+    parsed without stripping markdown code blocks.
+    """
+    return {
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt}
+        ],
+        "model": openai_model,
+        "temperature": openai_temperature,
+        "response_format": {"type": "json_object"}
+    }
+
+
+def request_openai_json(system_prompt, prompt, cache_key):
+    """
+    Send a chat completion request to OpenAI and return the parsed JSON response,
+    memoizing the result on disk so repeated requests skip the API call.
+
+    Args:
+        system_prompt (str): Content of the system message.
+        prompt (str): Content of the user message.
+        cache_key (str): Stable description of the request inputs.
+
+    Returns:
+        dict: Parsed JSON response from OpenAI.
+    """
+    key = hash_cache_key(cache_key)
+    cached_response = openai_cache.get(key)
+    if cached_response is not None:
+        return cached_response
+
+    response = client.chat.completions.create(**build_chat_completion_request(system_prompt, prompt))
+
+    # Parse the AI-generated response; only successfully parsed responses are cached
+    ai_response = orjson.loads(response.choices[0].message.content)
+    openai_cache.set(key, ai_response)
+    return ai_response
+
+
+def request_openai_json_batch(requests):
+    """
+    Send chat completion requests through the OpenAI Batch API and wait for the results.
+
+    The Batch API is cheaper but completes asynchronously (within 24 hours), so it
+    suits report runs that are not time-critical. Cached responses are reused and
+    only the remaining requests are submitted.
+
+    Args:
+        requests (list of tuple): (system_prompt, prompt, cache_key) for each request.
+
+    Returns:
+        list: Parsed JSON response for each request, or None where the request failed.
+    """
+    keys = [hash_cache_key(cache_key) for _, _, cache_key in requests]
+    results = [openai_cache.get(key) for key in keys]
+    pending = [i for i, result in enumerate(results) if result is None]
+    if not pending:
+        return results
+
+    # Upload the pending requests as a JSONL file and start the batch job
+    batch_input = b"\n".join(
+        orjson.dumps({
+            "custom_id": str(i),
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": build_chat_completion_request(requests[i][0], requests[i][1])
+        })
+        for i in pending
+    )
+    batch_file = client.files.create(file=("batch_input.jsonl", batch_input), purpose="batch")
+    batch_job = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+
+    # Wait for the batch job to finish
+    while batch_job.status not in ("completed", "failed", "expired", "cancelled"):
+        time.sleep(openai_batch_poll_interval)
+        batch_job = client.batches.retrieve(batch_job.id)
+    if batch_job.status != "completed":
+        raise RuntimeError(f"Batch job {batch_job.id} finished with status '{batch_job.status}'")
+    if not batch_job.output_file_id:
+        raise RuntimeError(f"Batch job {batch_job.id} produced no output")
+
+    # Parse the results, matching them to the requests by custom_id
+    for line in client.files.content(batch_job.output_file_id).text.splitlines():
+        item = orjson.loads(line)
+        i = int(item["custom_id"])
+        try:
+            content = item["response"]["body"]["choices"][0]["message"]["content"]
+            results[i] = orjson.loads(content)
+            openai_cache.set(keys[i], results[i])
+        except (TypeError, KeyError, IndexError, orjson.JSONDecodeError) as e:
+            print(f"Error parsing batch response for request {i}: {e}")
+
+    return results
+
+
+# Only repeated runs on the same file (CLI, notebooks) benefit from the cache, so
+# it keeps few parsed datasets alive
+@lru_cache(maxsize=2)
+def _load_analysis_data_cached(input_file, mtime_ns, size):
+    # mtime_ns and size are only part of the cache key, so that a modified file is parsed again
+    with open(input_file, "rb") as json_file:
+        data = orjson.loads(json_file.read())
     return data
 
 
+def load_analysis_data(input_file):
+    """
+    Load the analysis JSON file, reusing the parsed data while the file is unchanged.
+    Already parsed analysis data is returned as is.
+
+    The returned data is shared between calls and must not be modified.
+    """
+    if isinstance(input_file, dict):
+        return input_file
+
+    stat = os.stat(input_file)
+    return _load_analysis_data_cached(os.path.abspath(input_file), stat.st_mtime_ns, stat.st_size)
+
+
+def count_generalized_topics(reviews):
+    # Count all topics in a single pass, so the counting loop runs in C
+    topic_counts = Counter(chain.from_iterable(review["generalized_key_topics"] for review in reviews))
+    return dict(topic_counts)
+
+
 def summarize_insights(data):
     report_data = {}
     report_data["review_counts"] = {
         sentiment: len(reviews) for sentiment, reviews in data.items()
     }
     report_data["generalized_topics_by_sentiment"] = {
-        sentiment: dict(Counter([topic for review in reviews for topic in review["generalized_key_topics"]]))
+        sentiment: count_generalized_topics(reviews)
         for sentiment, reviews in data.items()
     }
     return report_data
@@ -30,11 +181,11 @@ def summarize_insights(data):
 def calculate_percentage_distribution(report_data):
     percentage_distributions = {}
     for sentiment, topics in report_data["generalized_topics_by_sentiment"].items():
-        total_mentions = sum(topics.values())
+        counts = np.fromiter(topics.values(), dtype=np.float64, count=len(topics))
+        total_mentions = counts.sum()
         if total_mentions > 0:
-            percentage_distributions[sentiment] = {
-                topic: (count / total_mentions) * 100 for topic, count in topics.items()
-            }
+            percentages = counts / total_mentions * 100
+            percentage_distributions[sentiment] = dict(zip(topics.keys(), percentages.tolist()))
         else:
             percentage_distributions[sentiment] = {}
     report_data["percentage_distribution_by_sentiment"] = percentage_distributions
@@ -48,24 +199,24 @@ def group_reviews_by_top_topics(data, report_data, top_n=3):
         reverse=True
     )
     top_worst_topics = [topic for topic, _ in negative_topic_percentages[:top_n]]
+    top_worst_topics_set = set(top_worst_topics)
     grouped_reviews = {topic: [] for topic in top_worst_topics}
     for review in data.get("negative", []):
-        for topic in top_worst_topics:
-            if topic in review["generalized_key_topics"]:
-                grouped_reviews[topic].append(review)
+        for topic in top_worst_topics_set.intersection(review["generalized_key_topics"]):
+            grouped_reviews[topic].append(review)
     return {"top_worst_topics": top_worst_topics, "grouped_reviews_by_topic": grouped_reviews}
 
 
-def generate_problem_description_and_recommendations(topic, reviews):
+def build_problem_description_request(topic, reviews):
     """
-    Generate a short description of the problem and recommendations for a given topic using OpenAI.
+    Build the OpenAI request describing the problem and recommendations for a given topic.
 
     Args:
         topic (str): The topic for which the description and recommendations are generated.
         reviews (list of dict): List of reviews related to the topic.
 
     Returns:
-        dict: A dictionary containing the topic, AI-generated description, and recommendations.
+        tuple: System prompt, user prompt and cache key of the request.
     """
     # Create a numbered list of reviews
     numbered_reviews = "\n".join([f"{i + 1}. {review['review']}" for i, review in enumerate(reviews)])
@@ -81,7 +232,7 @@ def generate_problem_description_and_recommendations(topic, reviews):
         1. Generate a short description of the key problem related to this topic.
         2. Provide a list of actionable recommendations to address the identified problem.
         
-        Your response should be in the following format:
+        Your response should be a JSON object in the following format:
         {{
             "problem_description": "Short description of the problem.",
             "recommendations": [
@@ -90,48 +241,92 @@ def generate_problem_description_and_recommendations(topic, reviews):
                 ...
             ]
         }}
-        
-        Please ensure the response is in valid JSON format. Do not include any explanations, only provide a JSON outputR that is FC8259 compliant.
-        Do not include markdown code blocks in your response. Remove the ```json markdown from the output.
-
     """
 
-    try:
-        # Send the prompt to OpenAI
-        response = client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant for analyzing reviews and suggesting improvements."},
-                {"role": "user", "content": prompt}
-            ],
-            model=openai_model,
-            temperature=openai_temperature
-        )
-
-        # Parse the AI-generated response
-        ai_response = json.loads(response.choices[0].message.content.strip())
-
-        # Return the results
-        return {
-            "topic": topic,
-            "problem_description": ai_response.get("problem_description", "No description provided."),
-            "recommendations": ai_response.get("recommendations", [])
-        }
+    # Cache key is independent of the order in which reviews were collected
+    cache_key = topic + "\0" + "\n".join(sorted(review["review"] for review in reviews))
 
-    except Exception as e:
-        print(f"Error generating description and recommendations for topic '{topic}': {e}")
+    return (
+        "You are a helpful assistant for analyzing reviews and suggesting improvements.",
+        prompt,
+        cache_key
+    )
+
+
+def format_problem_description(topic, ai_response):
+    """
+    Build the problem summary for a topic from the AI response, or an error
+    placeholder if no response is available.
+    """
+    if ai_response is None:
         return {
             "topic": topic,
             "problem_description": "Error generating description.",
             "recommendations": []
         }
 
+    return {
+        "topic": topic,
+        "problem_description": ai_response.get("problem_description", "No description provided."),
+        "recommendations": ai_response.get("recommendations", [])
+    }
+
+
+def generate_problem_description_and_recommendations(topic, reviews):
+    """
+    Generate a short description of the problem and recommendations for a given topic using OpenAI.
+
+    Args:
+        topic (str): The topic for which the description and recommendations are generated.
+        reviews (list of dict): List of reviews related to the topic.
+
+    Returns:
+        dict: A dictionary containing the topic, AI-generated description, and recommendations.
+    """
+    try:
+        # Send the prompt to OpenAI (or reuse a cached response)
+        ai_response = request_openai_json(*build_problem_description_request(topic, reviews))
+        return format_problem_description(topic, ai_response)
+
+    except Exception as e:
+        print(f"Error generating description and recommendations for topic '{topic}': {e}")
+        return format_problem_description(topic, None)
+
+
+def generate_problem_descriptions_with_batch_api(grouped_reviews_by_topic):
+    """
+    Generate problem descriptions and recommendations for all topics with a single OpenAI batch job.
+
+    Args:
+        grouped_reviews_by_topic (dict): Mapping of topics to their related reviews.
+
+    Returns:
+        list of dict: Problem descriptions and recommendations for each topic.
+    """
+    requests = [
+        build_problem_description_request(topic, reviews)
+        for topic, reviews in grouped_reviews_by_topic.items()
+    ]
+
+    try:
+        ai_responses = request_openai_json_batch(requests)
+    except Exception as e:
+        print(f"Error generating descriptions and recommendations with the Batch API: {e}")
+        ai_responses = [None] * len(requests)
+
+    return [
+        format_problem_description(topic, ai_response)
+        for topic, ai_response in zip(grouped_reviews_by_topic, ai_responses)
+    ]
+
 
-def merge_problems_and_recommendations(problems_summary):
+def merge_problems_and_recommendations(problems_summary, use_batch_api=False):
     """
     Use OpenAI to merge overlapping problems and recommendations into a general summary.
 
     Args:
         problems_summary (list of dict): List of problem descriptions and recommendations for each topic.
+        use_batch_api (bool): Send the request through the OpenAI Batch API instead of the real-time API.
 
     Returns:
         dict: A dictionary containing the general problem description and consolidated recommendations.
@@ -155,7 +350,7 @@ def merge_problems_and_recommendations(problems_summary):
         Your task:
         1. Identify overlapping problems and merge them into a single general description of the hotel's issues.
         2. Consolidate the recommendations into a unified list, eliminating redundancies. Keep in the list only significant recommendations. The list should contain 5 recommendations at most.
-        3. Provide the output in the following format:
+        3. Provide the output as a JSON object in the following format:
         {{
             "general_problem_description": "A summary of the hotel's main problems.",
             "consolidated_recommendations": [
@@ -165,24 +360,22 @@ def merge_problems_and_recommendations(problems_summary):
             ]
         }}
         4. Make all generated texts easy to read and understand. Create recommendations in plain and attractive language.
-
-        Please ensure the response is in valid JSON format. Do not include any explanations, only provide a JSON outputR that is FC8259 compliant.
-        Do not include markdown code blocks in your response. Remove the ```json markdown from the output.
     """
 
+    request = (
+        "You are a helpful assistant for consolidating problems and recommendations.",
+        prompt,
+        orjson.dumps(problems_summary, option=orjson.OPT_SORT_KEYS).decode("utf-8")
+    )
+
     try:
-        # Send the prompt to OpenAI
-        response = client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant for consolidating problems and recommendations."},
-                {"role": "user", "content": prompt}
-            ],
-            model=openai_model,
-            temperature=openai_temperature
-        )
-
-        # Parse the AI-generated response
-        consolidated_results = json.loads(response.choices[0].message.content.strip())
+        # Send the prompt to OpenAI (or reuse a cached response)
+        if use_batch_api:
+            consolidated_results = request_openai_json_batch([request])[0]
+            if consolidated_results is None:
+                raise ValueError("no valid response returned by the batch job")
+        else:
+            consolidated_results = request_openai_json(*request)
         return consolidated_results
 
     except Exception as e:
@@ -194,18 +387,22 @@ def merge_problems_and_recommendations(problems_summary):
 
 
 def save_report_data(report_data, output_file):
-    with open(output_file, "w") as json_file:
-        json.dump(report_data, json_file, indent=4)
+    with open(output_file, "wb") as json_file:
+        json_file.write(orjson.dumps(report_data, option=orjson.OPT_INDENT_2))
     print(f"Report data successfully saved to {output_file}")
 
 
-def generate_report_data(input_path, output_path):
+def generate_report_data(input_path, output_path=None, use_batch_api=False):
     """
     Main function to generate report data by processing the input JSON.
 
     Args:
-        input_path (str): Path to the input analysis JSON file.
-        output_path (str): Path to save the final report JSON file.
+        input_path (str or dict): Path to the input analysis JSON file, or the 
+        already parsed analysis data.
+        output_path (str, optional): Path to save the final report JSON file. 
+        Defaults to None (the report data is only returned).
+        use_batch_api (bool): Use the OpenAI Batch API for the AI-generated sections.
+        This is cheaper but may take up to 24 hours to complete.
 
     Returns:
         dict: Final report data dictionary.
@@ -223,26 +420,39 @@ def generate_report_data(input_path, output_path):
     step_4_results = group_reviews_by_top_topics(data, report_data)
 
     # Step 5: Generate problem descriptions and recommendations
-    report_data["problems_summary"] = [
-        generate_problem_description_and_recommendations(topic, reviews)
-        for topic, reviews in step_4_results["grouped_reviews_by_topic"].items()
-    ]
+    grouped_reviews_by_topic = step_4_results["grouped_reviews_by_topic"]
+    if use_batch_api:
+        report_data["problems_summary"] = generate_problem_descriptions_with_batch_api(grouped_reviews_by_topic)
+    else:
+        # The per-topic requests are independent, so they are sent concurrently
+        with ThreadPoolExecutor(max_workers=max(len(grouped_reviews_by_topic), 1)) as executor:
+            report_data["problems_summary"] = list(executor.map(
+                generate_problem_description_and_recommendations,
+                grouped_reviews_by_topic.keys(),
+                grouped_reviews_by_topic.values()
+            ))
 
     # Step 6: Merge problems and recommendations
-    merged_results = merge_problems_and_recommendations(report_data["problems_summary"])
+    merged_results = merge_problems_and_recommendations(report_data["problems_summary"], use_batch_api)
     report_data["general_problem_description"] = merged_results.get("general_problem_description", "No description provided.")
     report_data["consolidated_recommendations"] = merged_results.get("consolidated_recommendations", [])
 
     # Step 7: Save report data
-    save_report_data(report_data, output_path)
+    if output_path is not None:
+        save_report_data(report_data, output_path)
 
     return report_data
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate report data from generalized analysis results.")
+    parser.add_argument("--async-batch", action="store_true",
+                        help="use the OpenAI Batch API (cheaper, but may take up to 24 hours)")
+    args = parser.parse_args()
+
     # File paths
     input_path = "data/processed/generalized.json"
     output_path = "data/processed/report_data.json"
 
     # Generate report data
-    generate_report_data(input_path, output_path)
\ No newline at end of file
+    generate_report_data(input_path, output_path, use_batch_api=args.async_batch)
\ No newline at end of file
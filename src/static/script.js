@@ -8,6 +8,9 @@ document.addEventListener('DOMContentLoaded', () => {
     const errorMessage = document.getElementById('error-message');
     const errorText = document.getElementById('error-text');
 
+    // Interval between report job status checks
+    const JOB_POLL_INTERVAL_MS = 2000;
+
     // Drag and drop functionality
     const dropZone = document.querySelector('label[for="file-upload"]');
 
@@ -82,6 +85,7 @@ document.addEventListener('DOMContentLoaded', () => {
         formData.append('file', file);
 
         try {
+            // Submit the report job
             const response = await fetch('http://localhost:5001/generate-report', {
                 method: 'POST',
                 body: formData
@@ -92,8 +96,20 @@ document.addEventListener('DOMContentLoaded', () => {
                 throw new Error(errorData.error || `HTTP error! status: ${response.status}`);
             }
 
+            const { job_id: jobId } = await response.json();
+
+            // Wait for the background job to finish
+            await waitForJob(jobId);
+
+            // Download the generated report
+            const reportResponse = await fetch(`http://localhost:5001/download/${jobId}`);
+            if (!reportResponse.ok) {
+                const errorData = await reportResponse.json();
+                throw new Error(errorData.error || `HTTP error! status: ${reportResponse.status}`);
+            }
+
             // Handle successful response
-            const blob = await response.blob();
+            const blob = await reportResponse.blob();
             const url = window.URL.createObjectURL(blob);
             const a = document.createElement('a');
             a.href = url;
@@ -114,6 +130,23 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     });
 
+    async function waitForJob(jobId) {
+        while (true) {
+            const response = await fetch(`http://localhost:5001/status/${jobId}`);
+            const statusData = await response.json();
+            if (!response.ok) {
+                throw new Error(statusData.error || `HTTP error! status: ${response.status}`);
+            }
+            if (statusData.status === 'completed') {
+                return;
+            }
+            if (statusData.status === 'failed') {
+                throw new Error(statusData.error);
+            }
+            await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+        }
+    }
+
     function showError(message) {
         errorText.textContent = message;
         errorMessage.classList.remove('hidden');
@@ -1,97 +1,381 @@
 import os
-import json
-import pandas as pd
-from openai import OpenAI
+import time
+import hashlib
+import random
+import asyncio
+import threading
+import argparse
+from collections import OrderedDict
+import orjson
+import simdjson
+import pyarrow as pa
+from pyarrow import csv as pacsv
+from diskcache import Cache
+from openai import OpenAI, AsyncOpenAI, RateLimitError, APIConnectionError, InternalServerError
 
 # Initialize OpenAI client
 client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
 openai_model = "gpt-4o-mini"
 openai_temperature = 0.7
 
+# Seconds to wait between status checks of an OpenAI batch job
+openai_batch_poll_interval = 30
+
+# Disk-backed cache for OpenAI responses, shared across processes and runs
+openai_cache = Cache(os.environ.get("OPENAI_CACHE_DIR", ".cache/openai"))
+
+# Rate limits and retry policy for the review analysis requests
+openai_max_requests_per_minute = 500
+openai_max_tokens_per_minute = 200000
+openai_max_attempts = 5
+openai_expected_completion_tokens = 200  # Per analyzed review
+
+# Number of reviews analyzed by a single OpenAI request, amortizing the prompt
+# and round-trip overhead over several reviews
+openai_reviews_per_request = 16
+
+# Number of recent analyses kept to reuse for duplicate reviews, bounding memory
+# on large runs
+openai_dedupe_cache_size = 10000
+
+# Reviews longer than this are cut at a sentence boundary before being analyzed
+# (about 500 tokens at 4 characters per token)
+openai_max_review_chars = 2000
+
+# Instructions shared by all analysis requests. They are sent as the system
+# message, so every request starts with the same prefix and benefits from
+# OpenAI prompt caching.
+ANALYSIS_SYSTEM_PROMPT = """You are a helpful assistant for text analysis.
+
+The user provides a JSON list of reviews, each with a "review_index" and a "text".
+Analyze each review and return one analysis per review, with the same "review_index":
+- "key_topics": A list of key topics mentioned in the text, such as "hotel cleanliness" or "service speed".
+- "sentiment": A summary of the overall sentiment ("positive", "neutral", or "negative") along with reasoning."""
+
+# Structured output schema of the analyses. Strict mode guarantees the response
+# is a JSON object matching it, so no formatting instructions are needed.
+ANALYSIS_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "analyses",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "analyses": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "review_index": {"type": "integer"},
+                            "key_topics": {"type": "array", "items": {"type": "string"}},
+                            "sentiment": {
+                                "type": "object",
+                                "properties": {
+                                    "summary": {"type": "string", "enum": ["positive", "neutral", "negative"]},
+                                    "reasoning": {"type": "string"}
+                                },
+                                "required": ["summary", "reasoning"],
+                                "additionalProperties": False
+                            }
+                        },
+                        "required": ["review_index", "key_topics", "sentiment"],
+                        "additionalProperties": False
+                    }
+                }
+            },
+            "required": ["analyses"],
+            "additionalProperties": False
+        }
+    }
+}
+
+# Static parts of the analysis messages, built once
+_SYS = {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT}
+_PROMPT_PREFIX = "Analyze these reviews: "
+
+# Size in bytes of the blocks read from the input CSV file
+csv_block_size = 1 << 20
+
+# Largest OpenAI response, in bytes, the JSON parsers accept
+json_parser_max_capacity = 1 << 22
 
-def analyze_text_with_openai(text):
+# simdjson parsers are reused so their buffers are only allocated once. They are
+# not thread-safe, so each thread gets its own parser.
+_parsers = threading.local()
+
+
+def get_json_parser():
     """
-    Analyze a single text using OpenAI API for sentiment and key topics, returning structured JSON output.
+    Return the simdjson parser of the current thread.
 
-    Args:
-        text (str): Input text to analyze.
+    A parser reuses its buffers, which invalidates the documents it returned
+    before: a document must be fully converted to Python objects before the
+    next call to parse().
+    """
+    parser = getattr(_parsers, "parser", None)
+    if parser is None:
+        parser = _parsers.parser = simdjson.Parser(max_capacity=json_parser_max_capacity)
+    return parser
+
+
+class RateLimiter:
+    """
+    Token-bucket rate limiter keeping concurrent OpenAI requests within both
+    the requests-per-minute and tokens-per-minute limits.
+    """
+
+    def __init__(self, max_requests_per_minute, max_tokens_per_minute):
+        self.max_requests_per_minute = max_requests_per_minute
+        self.max_tokens_per_minute = max_tokens_per_minute
+        self.available_request_capacity = max_requests_per_minute
+        self.available_token_capacity = max_tokens_per_minute
+        self.last_update_time = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _replenish(self):
+        now = time.monotonic()
+        elapsed = now - self.last_update_time
+        self.last_update_time = now
+        self.available_request_capacity = min(
+            self.max_requests_per_minute,
+            self.available_request_capacity + elapsed * self.max_requests_per_minute / 60
+        )
+        self.available_token_capacity = min(
+            self.max_tokens_per_minute,
+            self.available_token_capacity + elapsed * self.max_tokens_per_minute / 60
+        )
+
+    async def acquire(self, estimated_tokens):
+        """
+        Wait until there is capacity for one request consuming estimated_tokens tokens.
+        """
+        estimated_tokens = min(estimated_tokens, self.max_tokens_per_minute)
+        # Requests are served in order; later ones wait behind the lock
+        async with self.lock:
+            while True:
+                self._replenish()
+                if self.available_request_capacity >= 1 and self.available_token_capacity >= estimated_tokens:
+                    self.available_request_capacity -= 1
+                    self.available_token_capacity -= estimated_tokens
+                    return
+
+                # Sleep until enough capacity has been replenished
+                await asyncio.sleep(max(
+                    (1 - self.available_request_capacity) * 60 / self.max_requests_per_minute,
+                    (estimated_tokens - self.available_token_capacity) * 60 / self.max_tokens_per_minute
+                ))
+
+
+def estimate_tokens(messages, num_reviews):
+    """
+    Roughly estimate the tokens used by a request analyzing num_reviews reviews
+    (about 4 characters per token), including the expected completion.
+    """
+    prompt_tokens = sum(len(message["content"]) for message in messages) // 4
+    return prompt_tokens + openai_expected_completion_tokens * num_reviews
+
+
+def hash_text(text):
+    """
+    Return a digest identifying a text, used to analyze duplicate reviews only once.
+    """
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def truncate_review(text):
+    """
+    Shorten a review longer than openai_max_review_chars characters, cutting it after
+    the last complete sentence in the second half of the budget (or at the last space
+    if there is none, so an early sentence end does not drop most of the review).
+    """
+    if len(text) <= openai_max_review_chars:
+        return text
+
+    head = text[:openai_max_review_chars + 1]
+    cut = max(head.rfind(mark + space) for mark in ".!?" for space in " \n")
+    if cut >= openai_max_review_chars // 2:
+        return head[:cut + 1]
+    cut = head.rfind(" ")
+    return head[:cut] if cut > 0 else head[:openai_max_review_chars]
+
+
+def build_analysis_request(texts):
+    """
+    Build the chat completion request body analyzing a mini-batch of texts, shared
+    by the real-time and Batch APIs. Each text is identified by its index in texts.
+    """
+    reviews = [{"review_index": i, "text": truncate_review(text)} for i, text in enumerate(texts)]
+    return {
+        "messages": [_SYS, {"role": "user", "content": _PROMPT_PREFIX + orjson.dumps(reviews).decode("utf-8")}],
+        "model": openai_model,
+        "temperature": openai_temperature,
+        "response_format": ANALYSIS_RESPONSE_FORMAT
+    }
+
+
+def parse_analyses(structured_analysis, texts):
+    """
+    Parse the JSON analyses returned by OpenAI for a mini-batch of texts, matching
+    them to the texts by review_index.
+
+    Only the fields used downstream are converted to Python objects; the rest of
+    the response is never materialized.
 
     Returns:
-        dict: Structured analysis results including key topics and sentiment.
+        list: Analysis of each text, in order, or None for the texts missing from
+        the response or whose analysis is invalid.
+
+    Raises:
+        ValueError: If the response is empty (e.g. the model refused), not valid JSON
+        or has no list of analyses.
     """
+    structured_analysis = (structured_analysis or "").strip()
+
+    # Validate and parse the JSON output
+    if not structured_analysis:
+        raise ValueError("Received an empty response from OpenAI.")
+
+    # Extract the required fields from the JSON string
+    analyses = [None] * len(texts)
     try:
-        response = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a helpful assistant for text analysis.",
-                },
-                {
-                    "role": "user", 
-                    "content": f"""
-                        Analyze the following text and provide the result in JSON format. The JSON should include:
-                        - "key_topics": A list of key topics mentioned in the text.
-                        - "sentiment": An object that contains a summary of the overall sentiment (only values allowed as overal sentiment are: "positive", "neutral", or "negative") along with reasoning.
-
-                        Text: {text}
-
-                        Your response should be in JSON format. Do not include any explanations, only provide a RFC8259 compliant.
-
-                        The JSON output should be in the following format:
-                        {{
-                            "key_topics": [
-                                "hotel cleanliness",
-                                "service speed"
-                            ],
-                            "sentiment": {{
-                                "summary": "neutral",
-                                "reasoning": "the text mentions a positive aspect of cleanliness"
-                            }}
-                        }}
-
-                        Do not include markdown code blocks in your response. Remove the ```json markdown from the output.
-                    """
+        doc = get_json_parser().parse(structured_analysis.encode("utf-8"))
+        for item in doc.at_pointer("/analyses"):
+            # An invalid item only leaves its own review without an analysis
+            try:
+                i = item.get("review_index")
+                if type(i) is not int or not 0 <= i < len(texts) or analyses[i] is not None:
+                    continue
+                analyses[i] = {
+                    "key_topics": item.at_pointer("/key_topics").as_list(),
+                    "sentiment": {
+                        "summary": str(item.at_pointer("/sentiment/summary")),
+                        "reasoning": str(item.at_pointer("/sentiment/reasoning"))
+                    },
+                    "review": texts[i]
                 }
-            ],
-            model=openai_model,
-            temperature=openai_temperature
-        )
+            except (ValueError, RuntimeError, KeyError, TypeError, AttributeError) as e:
+                print(f"Skipping invalid analysis in response: {e}")
+    except (ValueError, RuntimeError, KeyError, TypeError, AttributeError) as e:
+        print("Raw Response:", structured_analysis)
+        raise ValueError(f"Invalid analysis response: {e}") from e
+    finally:
+        # The parser cannot be reused while its documents are alive, and a raised
+        # exception keeps this frame (and its locals) alive in its traceback
+        doc = item = None
+    return analyses
 
-        # Parse the JSON output from the response
-        structured_analysis = response.choices[0].message.content.strip()
 
-        # Validate and parse the JSON output
-        if not structured_analysis:
-            print("Error: Received an empty response from OpenAI.")
-            return None
+def read_texts(input_file, chunk_size):
+    """
+    Stream the 'text' column of a CSV file in lists of up to chunk_size texts.
 
-        # Convert the JSON string to a Python dictionary
-        analysis_result = json.loads(structured_analysis)
-        analysis_result["review"] = text
-        return analysis_result
+    Only the 'text' column is parsed, block by block, with the PyArrow CSV reader.
 
-    except json.JSONDecodeError as e:
-        print(f"Error parsing JSON: {e}")
-        print("Raw Response:", structured_analysis)
-        return None
-    except Exception as e:
-        print(f"Error analyzing text: {e}")
+    Returns:
+        iterator: Lists of texts, or None if the file has no 'text' column.
+    """
+    try:
+        reader = pacsv.open_csv(
+            input_file,
+            read_options=pacsv.ReadOptions(block_size=csv_block_size),
+            parse_options=pacsv.ParseOptions(newlines_in_values=True),
+            convert_options=pacsv.ConvertOptions(include_columns=["text"], column_types={"text": pa.string()})
+        )
+    except KeyError:
+        print("Error: Input file must contain a 'text' column.")
         return None
 
+    def chunks():
+        for batch in reader:
+            texts = batch.column("text").to_pylist()
+            for start in range(0, len(texts), chunk_size):
+                yield texts[start:start + chunk_size]
+
+    return chunks()
+
+
+def screen_texts(chunks, skipped):
+    """
+    Drop the texts that need no OpenAI request from chunks of texts, counting them
+    in skipped["empty"]. Empty reviews have no topics or sentiment to analyze.
+    """
+    for chunk in chunks:
+        texts = [text for text in chunk if text.strip()]
+        skipped["empty"] += len(chunk) - len(texts)
+        if texts:
+            yield texts
+
+
+async def analyze_texts_batch_with_openai(texts, async_client, rate_limiter):
+    """
+    Analyze a mini-batch of texts using a single OpenAI API request for sentiment and key topics,
+    returning structured JSON output.
+
+    The response is streamed and its chunks are accumulated as they arrive, then
+    parsed once complete. Rate limit, connection and server errors, including
+    those interrupting the stream, are retried with exponential backoff, up to
+    openai_max_attempts attempts.
+
+    Args:
+        texts (list of str): Input texts to analyze.
+        async_client (AsyncOpenAI): OpenAI client used to send the request.
+        rate_limiter (RateLimiter): Rate limiter shared by all concurrent requests.
+
+    Returns:
+        list: Structured analysis results including key topics and sentiment for each
+        text, in order, or None for the texts missing from the response.
+
+    Raises:
+        Exception: If the texts could not be analyzed.
+    """
+    request_body = build_analysis_request(texts)
+    estimated_tokens = estimate_tokens(request_body["messages"], len(texts))
+
+    for attempt in range(1, openai_max_attempts + 1):
+        await rate_limiter.acquire(estimated_tokens)
+        try:
+            stream = await async_client.chat.completions.create(**request_body, stream=True)
+            content = "".join([chunk.choices[0].delta.content or "" async for chunk in stream if chunk.choices])
+            break
+        except (RateLimitError, APIConnectionError, InternalServerError) as e:
+            if attempt == openai_max_attempts:
+                raise
+            delay = 2 ** attempt + random.random()
+            print(f"OpenAI request failed ({e}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    # Parse the JSON output from the response
+    return parse_analyses(content, texts)
+
 
 def generalize_key_topics_with_openai(topics_list):
     """
     Use OpenAI to group similar topics and generalize them, while maintaining traceability.
 
+    Each unique topic is sent once, and the result is memoized on disk by the set of
+    topics, so rerunning the pipeline on the same topics skips the API call.
+
     Args:
         topics_list (list of str): A flat list of all topics for a specific sentiment.
 
     Returns:
         dict: A dictionary mapping generalized topics to their specific topics.
     """
+    topics = sorted(set(topics_list))
+    if not topics:
+        return {}
+
+    # Prepare topics as input for AI
+    topics_string = "\n".join(topics)
+    cache_key = hashlib.blake2b(
+        f"generalize\0{openai_model}\0{openai_temperature}\0{topics_string}".encode("utf-8")
+    ).hexdigest()
+    cached_topics = openai_cache.get(cache_key)
+    if cached_topics is not None:
+        return cached_topics
+
     try:
-        # Prepare topics as input for AI
-        topics_string = "\n".join(topics_list)
         prompt = f"""
             Group the following topics into specific, distinct categories based on logical themes. Avoid overly broad or generic groupings. 
 
@@ -125,7 +409,9 @@ def generalize_key_topics_with_openai(topics_list):
         )
 
         # Parse the JSON response
-        generalized_topics = json.loads(response.choices[0].message.content.strip())
+        content = response.choices[0].message.content.strip()
+        generalized_topics = get_json_parser().parse(content.encode("utf-8")).as_dict()
+        openai_cache.set(cache_key, generalized_topics)
         return generalized_topics
 
     except Exception as e:
@@ -133,48 +419,231 @@ def generalize_key_topics_with_openai(topics_list):
         return {}
 
 
-def batch_process_texts(input_file, output_file, limit=None, chunk_size=1000):
+async def analyze_texts_with_openai(chunks, limit, max_concurrency, results_jsonl):
     """
-    Batch process multiple texts for analysis and save the results to a JSON file.
-
-    Args:
-        input_file (str): Path to the input CSV file with a 'text' column.
-        output_file (str): Path to save the analyzed results.
-        limit (int, optional): Maximum number of rows to analyze. Defaults to None (no limit).
-        chunk_size (int, optional): Number of rows to read per chunk. Defaults to 1000.
+    Analyze chunks of texts concurrently, keeping at most max_concurrency OpenAI
+    requests in flight. Each request analyzes up to openai_reviews_per_request
+    unique texts. Analysis results are written to results_jsonl in input order as
+    soon as each batch of requests completes.
 
     Returns:
-        None
+        tuple: Number of analyzed rows and the reviews that could not be analyzed.
     """
     rows_processed = 0  # Counter for the number of rows processed
-    results = []  # List to store analysis results
+    failures = []  # List to store reviews that could not be analyzed
+    semaphore = asyncio.Semaphore(max_concurrency)
+    rate_limiter = RateLimiter(openai_max_requests_per_minute, openai_max_tokens_per_minute)
+
+    # Analysis task and position in its mini-batch by text digest for the texts
+    # being analyzed, so duplicates within a batch are analyzed once
+    pending_analyses = {}
+    # Most recent successful analyses by text digest, reused for later duplicates
+    recent_analyses = OrderedDict()
+
+    # Retries are handled by analyze_texts_batch_with_openai, so the client does not retry itself
+    async with AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"), max_retries=0) as async_client:
+        async def analyze_unique(texts):
+            async with semaphore:
+                return await analyze_texts_batch_with_openai(texts, async_client, rate_limiter)
+
+        def submit(texts):
+            # Group the texts not analyzed yet into mini-batches, one request each
+            pending = {}
+            for text in texts:
+                key = hash_text(text)
+                if key not in recent_analyses and key not in pending_analyses and key not in pending:
+                    pending[key] = text
+            keys = list(pending)
+            for start in range(0, len(keys), openai_reviews_per_request):
+                mini_batch = keys[start:start + openai_reviews_per_request]
+                task = asyncio.ensure_future(analyze_unique([pending[key] for key in mini_batch]))
+                for position, key in enumerate(mini_batch):
+                    pending_analyses[key] = (task, position)
+
+        async def analyze(text):
+            key = hash_text(text)
+            if key in recent_analyses:
+                recent_analyses.move_to_end(key)
+                return recent_analyses[key]
+
+            task, position = pending_analyses[key]
+            try:
+                analysis = (await task)[position]
+            except Exception as e:
+                print(f"Error analyzing text: {e}")
+                failures.append({"review": text, "error": str(e)})
+                return None
+            if analysis is None:
+                failures.append({"review": text, "error": "No analysis returned for the review"})
+                return None
+
+            recent_analyses[key] = analysis
+            if len(recent_analyses) > openai_dedupe_cache_size:
+                recent_analyses.popitem(last=False)
+            return analysis
+
+        # Process the file in chunks
+        for texts in chunks:
+            # Analyze the texts concurrently; failed analyses do not count towards
+            # the limit, so keep submitting the remaining texts until it is reached
+            while texts and not (limit and rows_processed >= limit):
+                batch_size = limit - rows_processed if limit else len(texts)
+                batch, texts = texts[:batch_size], texts[batch_size:]
+                submit(batch)
+                batch_analyses = await asyncio.gather(*(analyze(text) for text in batch))
+                # Release the finished tasks; only the bounded recent analyses are kept
+                pending_analyses.clear()
+                for analysis in batch_analyses:
+                    if analysis:
+                        results_jsonl.write(orjson.dumps(analysis) + b"\n")
+                        rows_processed += 1
+
+            # Break outer loop if limit is reached
+            if limit and rows_processed >= limit:
+                break
 
-    # Process the file in chunks
-    for chunk in pd.read_csv(input_file, chunksize=chunk_size):
-        # Ensure 'text' column exists in the chunk
-        if 'text' not in chunk.columns:
-            print("Error: Input file must contain a 'text' column.")
-            return
+    return rows_processed, failures
 
-        # Iterate through rows in the chunk
-        for _, row in chunk.iterrows():
-            if limit and rows_processed >= limit:
-                break  # Stop processing if the limit is reached
 
-            # Analyze the text
-            text = row['text']
-            analysis = analyze_text_with_openai(text)
-            if analysis:
-                results.append(analysis)
-                rows_processed += 1
+def analyze_texts_with_batch_api(chunks, limit, results_jsonl):
+    """
+    Analyze chunks of texts with the OpenAI Batch API, wait for the results and
+    write them to results_jsonl in input order.
+
+    The Batch API is cheaper and has higher rate limits, but completes asynchronously
+    (within 24 hours). Failed analyses are not replaced by further rows, so at most
+    limit rows are analyzed.
 
-        # Break outer loop if limit is reached
-        if limit and rows_processed >= limit:
+    Returns:
+        tuple: Number of analyzed rows and the reviews that could not be analyzed.
+    """
+    texts = []  # Unique texts to analyze
+    rows = []  # Index in texts of the text of each row
+    unique_index = {}  # Index in texts by text digest
+
+    # Collect the unique texts to analyze
+    for chunk in chunks:
+        for text in chunk:
+            if limit and len(rows) >= limit:
+                break
+            key = hash_text(text)
+            if key in unique_index:
+                rows.append(unique_index[key])
+                continue
+            unique_index[key] = len(texts)
+            rows.append(len(texts))
+            texts.append(text)
+
+        if limit and len(rows) >= limit:
             break
 
-    # Save the analyzed results
-    with open(output_file, "w") as json_file:
-        json.dump(results, json_file, indent=4)
+    if not texts:
+        return 0, []
+
+    # Build one request per mini-batch of texts, identified by the index of its first text
+    batch_input = [
+        orjson.dumps({
+            "custom_id": f"row-{start}",
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": build_analysis_request(texts[start:start + openai_reviews_per_request])
+        })
+        for start in range(0, len(texts), openai_reviews_per_request)
+    ]
+
+    # Upload the requests as a JSONL file and start the batch job
+    batch_file = client.files.create(
+        file=("batch_input.jsonl", b"\n".join(batch_input)),
+        purpose="batch"
+    )
+    batch_job = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+    print(f"Submitted batch job {batch_job.id} with {len(texts)} unique rows in {len(batch_input)} requests")
+
+    # Wait for the batch job to finish
+    while batch_job.status not in ("completed", "failed", "expired", "cancelled"):
+        time.sleep(openai_batch_poll_interval)
+        batch_job = client.batches.retrieve(batch_job.id)
+    if batch_job.status != "completed":
+        raise RuntimeError(f"Batch job {batch_job.id} finished with status '{batch_job.status}'")
+
+    # Parse the results, matching them to the texts by custom_id
+    analyses = [None] * len(texts)
+    errors = {}
+    if batch_job.output_file_id:
+        for line in client.files.content(batch_job.output_file_id).text.splitlines():
+            item = orjson.loads(line)
+            start = int(item["custom_id"].removeprefix("row-"))
+            end = min(start + openai_reviews_per_request, len(texts))
+            try:
+                content = item["response"]["body"]["choices"][0]["message"]["content"]
+                analyses[start:end] = parse_analyses(content, texts[start:end])
+            except (TypeError, KeyError, IndexError, ValueError) as e:
+                for i in range(start, end):
+                    errors[i] = str(item.get("error") or e)
+
+    rows_processed = 0
+    failures = []
+    for i in rows:
+        if analyses[i] is not None:
+            results_jsonl.write(orjson.dumps(analyses[i]) + b"\n")
+            rows_processed += 1
+        else:
+            failures.append({"review": texts[i], "error": errors.get(i, "No response returned by the batch job")})
+    return rows_processed, failures
+
+
+def batch_process_texts(input_file, output_file, limit=None, chunk_size=1000, max_concurrency=8,
+                        failures_file=None, use_batch_api=False):
+    """
+    Batch process multiple texts for analysis and stream the results to a JSONL file,
+    one analysis per line. Reviews that could not be analyzed are written to a
+    separate JSONL file.
+
+    Args:
+        input_file (str): Path to the input CSV file with a 'text' column.
+        output_file (str): Path to save the analyzed results.
+        limit (int, optional): Maximum number of rows to analyze. Defaults to None (no limit).
+        chunk_size (int, optional): Number of rows to read per chunk. Defaults to 1000.
+        max_concurrency (int, optional): Maximum number of concurrent OpenAI requests. Defaults to 8.
+        failures_file (str, optional): Path to save the reviews that could not be analyzed. 
+        Defaults to the output file name with a "_failed.jsonl" suffix.
+        use_batch_api (bool, optional): Use the OpenAI Batch API instead of real-time requests. 
+        This is cheaper but may take up to 24 hours to complete. Defaults to False.
+
+    Returns:
+        None
+    """
+    chunks = read_texts(input_file, chunk_size)
+    if chunks is None:
+        return
+
+    # Screen out the reviews that can be handled locally, without an OpenAI request
+    skipped = {"empty": 0}
+    chunks = screen_texts(chunks, skipped)
+
+    # Analyze the texts, writing each result to the output file as it completes
+    with open(output_file, "wb") as results_jsonl:
+        if use_batch_api:
+            rows_processed, failures = analyze_texts_with_batch_api(chunks, limit, results_jsonl)
+        else:
+            rows_processed, failures = asyncio.run(
+                analyze_texts_with_openai(chunks, limit, max_concurrency, results_jsonl)
+            )
+    if skipped["empty"]:
+        print(f"Skipped {skipped['empty']} empty reviews")
+
+    # Save the reviews that could not be analyzed, so they can be retried later
+    if failures:
+        if failures_file is None:
+            failures_file = f"{os.path.splitext(output_file)[0]}_failed.jsonl"
+        with open(failures_file, "wb") as failures_jsonl:
+            for failure in failures:
+                failures_jsonl.write(orjson.dumps(failure) + b"\n")
+        print(f"Failed to analyze {len(failures)} rows, saved them to {failures_file}")
 
     print(f"Processed {rows_processed} rows and saved results to {output_file}")
 
@@ -184,13 +653,13 @@ def group_reviews_by_sentiment(input_file):
     Group reviews by sentiment and return grouped reviews.
 
     Args:
-        input_file (str): Path to the JSON file with analysis results.
+        input_file (str): Path to the JSONL file with analysis results.
 
     Returns:
         dict: Grouped reviews by sentiment (positive, negative, neutral).
     """
-    with open(input_file, "r") as file:
-        data = json.load(file)
+    with open(input_file, "rb") as file:
+        data = [orjson.loads(line) for line in file]
 
     grouped_reviews = {"positive": [], "negative": [], "neutral": []}
 
@@ -207,7 +676,7 @@ def process_and_save_generalized_topics(input_file, output_file):
     Generalize topics for positive and negative reviews and save the updated dataset.
 
     Args:
-        input_file (str): Path to the JSON file with grouped reviews.
+        input_file (str): Path to the JSONL file with analysis results.
         output_file (str): Path to save the updated JSON file.
 
     Returns:
@@ -215,10 +684,11 @@ def process_and_save_generalized_topics(input_file, output_file):
     """
     grouped_reviews = group_reviews_by_sentiment(input_file)
 
-    key_topics_by_sentiment = {"positive": [], "negative": [], "neutral": []}
-    for sentiment, reviews in grouped_reviews.items():
-        for review in reviews:
-            key_topics_by_sentiment[sentiment].extend(review["key_topics"])
+    # Collect the unique key topics of each sentiment, sorted so the prompt is stable across runs
+    key_topics_by_sentiment = {
+        sentiment: sorted({topic for review in reviews for topic in review["key_topics"]})
+        for sentiment, reviews in grouped_reviews.items()
+    }
 
     generalized_topics_by_sentiment = {}
     for sentiment, topics in key_topics_by_sentiment.items():
@@ -228,26 +698,36 @@ def process_and_save_generalized_topics(input_file, output_file):
 
     for sentiment, reviews in grouped_reviews.items():
         if sentiment in generalized_topics_by_sentiment:
-            generalized_topics = generalized_topics_by_sentiment[sentiment]
+            # Map each specific topic to the generalized topics containing it
+            specific_to_general = {}
+            for general_topic, specific_topics in generalized_topics_by_sentiment[sentiment].items():
+                for specific_topic in specific_topics:
+                    specific_to_general.setdefault(specific_topic, []).append(general_topic)
+
             for review in reviews:
                 review["generalized_key_topics"] = list({
                     general_topic
-                    for general_topic, specific_topics in generalized_topics.items()
-                    if any(specific_topic in review["key_topics"] for specific_topic in specific_topics)
+                    for specific_topic in set(review["key_topics"])
+                    for general_topic in specific_to_general.get(specific_topic, ())
                 })
 
-    with open(output_file, "w") as file:
-        json.dump(grouped_reviews, file, indent=4)
+    with open(output_file, "wb") as file:
+        file.write(orjson.dumps(grouped_reviews, option=orjson.OPT_INDENT_2))
 
     print(f"Generalized topics and updated dataset saved to {output_file}")
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyze hotel reviews and generalize their topics.")
+    parser.add_argument("--async-batch", action="store_true",
+                        help="use the OpenAI Batch API (cheaper, but may take up to 24 hours)")
+    args = parser.parse_args()
+
     input_path = "data/processed/hotel_reviews_filtered.csv"
-    output_analysis_path = "data/processed/1_analysis.json"
+    output_analysis_path = "data/processed/1_analysis.jsonl"
     output_generalized_path = "data/processed/1_generalized.json"
 
     # Process the first 100 reviews in chunks of 1000 rows each
-    batch_process_texts(input_path, output_analysis_path, limit=10, chunk_size=100)
+    batch_process_texts(input_path, output_analysis_path, limit=10, chunk_size=100, use_batch_api=args.async_batch)
     # Generalize topics and save
     process_and_save_generalized_topics(output_analysis_path, output_generalized_path)
\ No newline at end of file
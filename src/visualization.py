@@ -1,13 +1,10 @@
-import json
 import os
+import orjson
 from fpdf import FPDF
-import matplotlib.pyplot as plt
-
-from PIL import Image
-from tempfile import NamedTemporaryFile
 
 import matplotlib
-matplotlib.use("Agg")  # Use a non-GUI backend for Matplotlib
+matplotlib.use("Agg")  # Use a non-GUI backend for Matplotlib, before pyplot is imported
+import matplotlib.pyplot as plt
 
 class PDFReport(FPDF):
     """
@@ -53,19 +50,9 @@ class PDFReport(FPDF):
         if title:
             self.section_title(title)
         try:
-            # Open the image file
-            with Image.open(chart_path) as img:
-                # Save the image temporarily to disk
-                with NamedTemporaryFile(delete=False, suffix=".png") as tmp_file:
-                    temp_path = tmp_file.name
-                    img.save(temp_path, format="PNG")
-            
-            # Embed the temporarily saved image into the PDF
-            self.image(temp_path, x=10, w=190)
+            # Embed the image file into the PDF as is
+            self.image(chart_path, x=10, w=190)
             self.ln(10)
-            
-            # Delete the temporary file after embedding
-            os.remove(temp_path)
         except Exception as e:
             print(f"Error embedding chart from {chart_path}: {e}")
 
@@ -80,13 +67,13 @@ def generate_sentiment_bar_chart(sentiment_counts, output_path):
     sentiments = list(sentiment_counts.keys())
     counts = list(sentiment_counts.values())
 
-    plt.figure(figsize=(8, 5))
-    plt.bar(sentiments, counts, color=['green', 'red', 'gray'])
-    plt.title("Sentiment Distribution")
-    plt.xlabel("Sentiments")
-    plt.ylabel("Number of Reviews")
-    plt.savefig(output_path)
-    plt.close()
+    fig, ax = plt.subplots(figsize=(8, 5))
+    ax.bar(sentiments, counts, color=['green', 'red', 'gray'])
+    ax.set_title("Sentiment Distribution")
+    ax.set_xlabel("Sentiments")
+    ax.set_ylabel("Number of Reviews")
+    fig.savefig(output_path)
+    plt.close(fig)
     print(f"Sentiment bar chart saved to {output_path}")
 
 def generate_negative_topic_pie_chart(negative_topic_percentages, output_path):
@@ -100,11 +87,11 @@ def generate_negative_topic_pie_chart(negative_topic_percentages, output_path):
     topics = list(negative_topic_percentages.keys())
     percentages = list(negative_topic_percentages.values())
 
-    plt.figure(figsize=(8, 5))
-    plt.pie(percentages, labels=topics, autopct='%1.1f%%', startangle=140)
-    plt.title("Negative Topics Distribution")
-    plt.savefig(output_path)
-    plt.close()
+    fig, ax = plt.subplots(figsize=(8, 5))
+    ax.pie(percentages, labels=topics, autopct='%1.1f%%', startangle=140)
+    ax.set_title("Negative Topics Distribution")
+    fig.savefig(output_path)
+    plt.close(fig)
     print(f"Negative topics pie chart saved to {output_path}")
 
 def generate_pdf_report(report_data, output_dir="outputs", report_name="final_report.pdf"):
@@ -182,8 +169,8 @@ def generate_pdf_report(report_data, output_dir="outputs", report_name="final_re
 if __name__ == "__main__":
     # Load report data
     input_file = "data/processed/report_data.json"
-    with open(input_file, "r") as json_file:
-        report_data = json.load(json_file)
+    with open(input_file, "rb") as json_file:
+        report_data = orjson.loads(json_file.read())
 
     # Generate the report with a custom name
     generate_pdf_report(report_data, report_name="hotel_review_analysis.pdf")
\ No newline at end of file
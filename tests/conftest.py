@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+
+# The modules live in src/ and create their OpenAI clients and caches at import
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("OPENAI_CACHE_DIR", tempfile.mkdtemp())
@@ -0,0 +1,116 @@
+import orjson
+import pandas as pd
+import pytest
+from types import SimpleNamespace
+
+import text_analysis
+
+
+def make_response(reviews, invalid=False):
+    if invalid:
+        return '{"analyses": 5}'
+    return orjson.dumps({"analyses": [
+        {
+            "review_index": review["review_index"],
+            "key_topics": [review["text"]],
+            "sentiment": {"summary": "positive", "reasoning": "test"}
+        }
+        for review in reviews
+    ]}).decode("utf-8")
+
+
+class FakeCompletions:
+    """
+    Streams a valid analysis for every request, except an invalid one for the first
+    if invalid_first is set.
+    """
+
+    def __init__(self, invalid_first=True):
+        self.calls = 0
+        self.invalid_first = invalid_first
+
+    async def create(self, messages, stream, **kwargs):
+        self.calls += 1
+        prompt = messages[-1]["content"]
+        reviews = orjson.loads(prompt[len(text_analysis._PROMPT_PREFIX):])
+        content = make_response(reviews, invalid=self.invalid_first and self.calls == 1)
+
+        async def chunks():
+            for start in range(0, len(content), 10):
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content[start:start + 10]))])
+
+        return chunks()
+
+
+class FakeAsyncOpenAI:
+    completions = None
+
+    def __init__(self, **kwargs):
+        self.chat = SimpleNamespace(completions=self.completions)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+def test_parse_analyses_after_invalid_response():
+    with pytest.raises(ValueError):
+        text_analysis.parse_analyses('{"analyses": 5}', ["first"])
+
+    analyses = text_analysis.parse_analyses(make_response([{"review_index": 0, "text": "second"}]), ["second"])
+    assert analyses[0]["key_topics"] == ["second"]
+
+
+def test_invalid_response_does_not_fail_later_requests(tmp_path, monkeypatch):
+    monkeypatch.setattr(FakeAsyncOpenAI, "completions", FakeCompletions())
+    monkeypatch.setattr(text_analysis, "AsyncOpenAI", FakeAsyncOpenAI)
+    monkeypatch.setattr(text_analysis, "openai_reviews_per_request", 4)
+    input_file = tmp_path / "reviews.csv"
+    output_file = tmp_path / "analysis.jsonl"
+    pd.DataFrame({"text": [f"review {i}" for i in range(12)]}).to_csv(input_file, index=False)
+
+    text_analysis.batch_process_texts(str(input_file), str(output_file), max_concurrency=1)
+
+    with open(output_file, "rb") as results:
+        reviews = [orjson.loads(line)["review"] for line in results]
+    assert reviews == [f"review {i}" for i in range(4, 12)]
+
+
+def test_parse_analyses_skips_only_invalid_items():
+    content = orjson.loads(make_response([{"review_index": i, "text": f"review {i}"} for i in range(3)]))
+    del content["analyses"][1]["key_topics"]
+
+    analyses = text_analysis.parse_analyses(orjson.dumps(content).decode("utf-8"), ["a", "b", "c"])
+    assert [analysis and analysis["review"] for analysis in analyses] == ["a", None, "c"]
+
+
+def test_truncate_review_keeps_most_of_the_budget():
+    limit = text_analysis.openai_max_review_chars
+    late_sentence = "word " * (limit // 5 - 10) + "End. " + "tail " * 200
+    assert text_analysis.truncate_review(late_sentence).endswith("End.")
+
+    early_sentence = "Ugh. " + "word " * 600
+    truncated = text_analysis.truncate_review(early_sentence)
+    assert limit - 5 <= len(truncated) <= limit
+    assert text_analysis.truncate_review("short review") == "short review"
+
+
+def test_duplicate_reviews_are_analyzed_once(tmp_path, monkeypatch):
+    completions = FakeCompletions(invalid_first=False)
+    monkeypatch.setattr(FakeAsyncOpenAI, "completions", completions)
+    monkeypatch.setattr(text_analysis, "AsyncOpenAI", FakeAsyncOpenAI)
+    monkeypatch.setattr(text_analysis, "openai_dedupe_cache_size", 2)
+    input_file = tmp_path / "reviews.csv"
+    output_file = tmp_path / "analysis.jsonl"
+    texts = ["great", "great", "bad", "great", "ok", "fine", "great"]
+    pd.DataFrame({"text": texts}).to_csv(input_file, index=False)
+
+    text_analysis.batch_process_texts(str(input_file), str(output_file), chunk_size=3)
+
+    with open(output_file, "rb") as results:
+        assert [orjson.loads(line)["review"] for line in results] == texts
+    # One request per chunk; "great" is reused in the second chunk, then evicted
+    # by "ok" and "fine" before the third
+    assert completions.calls == 3